@@ -10,7 +10,8 @@ import logging
 import re
 import unicodedata
 from datetime import datetime
-from typing import Dict, List, Set, Tuple, Optional
+from typing import Any, Dict, List, Set, Tuple, Optional
+from urllib.parse import urljoin, urlparse, parse_qs, urlencode, urlunparse
 import psycopg2
 from psycopg2.extras import execute_values
 from selenium import webdriver
@@ -27,6 +28,27 @@ logger = logging.getLogger(__name__)
 # Database connection from environment variable
 DATABASE_URL = os.environ.get('DATABASE_URL')
 
+# Name of the Postgres advisory lock that lets only one sync run at a time.
+# The lock key is hashtext(name), computed by the server, so every process that
+# uses the same name (this script, cron and manual runs) contends for the same lock.
+SYNC_ADVISORY_LOCK_NAME = 'buyme_db_sync'
+
+# How store lists are read from product pages:
+#   'network' - capture the JSON feed the page fetches (falls back to 'dom' if none found)
+#   'dom'     - scroll the rendered page and read img[alt]
+SCRAPE_MODE = os.environ.get('BUYME_SCRAPE_MODE', 'network').lower()
+
+# Verification mode: probe each product's store count and first screenful of
+# stores, and only run the full scrape when they differ from the last result
+VERIFY_MODE = os.environ.get('BUYME_VERIFY_MODE', '1').lower() not in ('0', 'false', 'no')
+# Products whose last full scrape is older than this are always fully scraped.
+# Just over the monthly cron interval, so each scheduled run after a full
+# scrape can verify instead (a product is fully scraped at least every other run)
+FULL_SCRAPE_MAX_AGE_DAYS = float(os.environ.get('BUYME_FULL_SCRAPE_MAX_AGE_DAYS', '35'))
+
+# Channel used to NOTIFY consumers of catalog changes (rows in sync_change_events)
+CHANGE_NOTIFY_CHANNEL = os.environ.get('BUYME_SYNC_NOTIFY_CHANNEL', 'catalog_changes')
+
 
 class BuyMeDBSyncer:
     """
@@ -38,17 +60,49 @@ class BuyMeDBSyncer:
     - Deduplication: Stores are normalized and matched to avoid duplicates
     - Case-insensitive matching for store names
     - Shared stores across multiple Buyme products are linked correctly
+    - Run exclusion: a Postgres advisory lock skips overlapping runs
+    - Short transactions: each product's links are committed on their own
+    - Network mode: store lists are read from the page's own JSON feed
+    - Change outbox: each product's link diff is written to sync_change_events
+      and announced with NOTIFY for precise cache invalidation
+    - Verification mode: unchanged products are confirmed with a cheap
+      count/sample probe instead of a full scrape
     """
     
     ISSUER_ID = 'buyme'  # Must match your DB issuer ID
     BUYME_PREFIX = 'buyme'  # Filter products starting with this (case-insensitive)
     
+    # JSON feed capture (network mode)
+    FEED_NAME_KEYS = ('name', 'title', 'brandName', 'brand_name', 'supplierName',
+                      'supplier_name', 'displayName', 'display_name')
+    # Wrappers a record's name may be nested under, e.g. {"supplier": {"name": ...}}
+    FEED_RECORD_WRAPPERS = ('supplier', 'brand', 'business', 'store', 'attributes')
+    FEED_URL_HINTS = ('brand', 'supplier', 'business', 'store', 'redeem')
+    FEED_WAIT_SECONDS = 10  # How long to wait for the page to request its feed
+    FEED_COUNT_TOLERANCE = 0.1  # Max relative gap between feed total and the page's count
+    MAX_FEED_PAGES = 100
+    
     def __init__(self):
         self.base_url = "https://buyme.co.il"
         self.driver = None
         self.conn = None
         # Cache for store names -> store IDs (to avoid duplicate DB queries)
         self.store_cache: Dict[str, str] = {}  # normalized_name -> store_id
+        # Stores created in the currently open transaction (evicted from cache on rollback)
+        self._pending_store_keys: List[str] = []
+        self._pending_store_ids: List[str] = []
+        # Lock hold timings for the run summary
+        self.run_lock_acquired_at: Optional[float] = None
+        self.product_tx_durations: Dict[str, float] = {}  # product_name -> seconds
+        # Link diffs written to the change outbox during this run
+        self.change_events: List[Dict] = []
+        # Store count shown on the page (_get_expected_store_count) on the last
+        # scrape, 0 if unknown. Saved as scraped_store_count for the probe to compare.
+        self.last_expected_count = 0
+        # JSON responses seen in the performance log whose bodies haven't finished loading
+        self._pending_feed_responses: Dict[str, str] = {}  # request_id -> url
+        # Last persisted result per product, for verification mode
+        self.product_snapshots: Dict[str, Dict] = {}  # product_name -> snapshot
         
     def _get_expected_store_count(self) -> int:
         """
@@ -238,6 +292,43 @@ class BuyMeDBSyncer:
         if self.conn:
             self.conn.close()
             logger.info("Database connection closed")
+
+    def acquire_run_lock(self) -> bool:
+        """
+        Try to take the session-level advisory lock that guards the sync.
+        Returns False immediately if another run already holds it.
+        """
+        cursor = self.conn.cursor()
+        try:
+            cursor.execute("SELECT pg_try_advisory_lock(hashtext(%s))", (SYNC_ADVISORY_LOCK_NAME,))
+            acquired = cursor.fetchone()[0]
+            # Session-level lock survives commit; don't leave the transaction open
+            self.conn.commit()
+        finally:
+            cursor.close()
+
+        if acquired:
+            self.run_lock_acquired_at = time.monotonic()
+            logger.info(f"Acquired sync advisory lock '{SYNC_ADVISORY_LOCK_NAME}'")
+        return acquired
+
+    def release_run_lock(self):
+        """Release the advisory lock taken by acquire_run_lock()."""
+        if self.run_lock_acquired_at is None or not self.conn or self.conn.closed:
+            return
+        cursor = self.conn.cursor()
+        try:
+            self.conn.rollback()
+            cursor.execute("SELECT pg_advisory_unlock(hashtext(%s))", (SYNC_ADVISORY_LOCK_NAME,))
+            self.conn.commit()
+            held = time.monotonic() - self.run_lock_acquired_at
+            logger.info(f"Released sync advisory lock (held {held:.1f}s)")
+        except Exception as e:
+            # Closing the connection releases session-level locks anyway
+            logger.warning(f"Could not release sync advisory lock: {e}")
+        finally:
+            cursor.close()
+            self.run_lock_acquired_at = None
         
     def setup_driver(self):
         """Setup Selenium WebDriver with Chrome in headless mode."""
@@ -249,6 +340,9 @@ class BuyMeDBSyncer:
         chrome_options.add_argument('--disable-gpu')
         chrome_options.add_argument('--window-size=1920,1080')
         chrome_options.add_argument('user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36')
+        if SCRAPE_MODE == 'network':
+            # Record DevTools Network events so the page's JSON responses can be read back
+            chrome_options.set_capability('goog:loggingPrefs', {'performance': 'ALL'})
         
         service = Service(ChromeDriverManager().install())
         self.driver = webdriver.Chrome(service=service, options=chrome_options)
@@ -272,10 +366,42 @@ class BuyMeDBSyncer:
             for store_id, name in cursor.fetchall():
                 normalized = self.normalize_store_name(name)
                 self.store_cache[normalized] = store_id
+            # End the read transaction so it isn't held open while scraping
+            self.conn.commit()
             logger.info(f"Loaded {len(self.store_cache)} existing stores into cache")
         finally:
             cursor.close()
     
+    def load_product_snapshots(self):
+        """
+        Load the last persisted result of each Buyme product: the store count
+        the page reported on its last full scrape, its linked store names and
+        how long ago it was fully scraped. Used by verification mode.
+        """
+        cursor = self.conn.cursor()
+        try:
+            cursor.execute("""
+                SELECT cp.name, cp.scraped_store_count,
+                       EXTRACT(EPOCH FROM NOW() - cp.last_scraped_at),
+                       COALESCE(array_agg(s.name) FILTER (WHERE s.name IS NOT NULL), '{}')
+                FROM card_products cp
+                LEFT JOIN card_product_stores cps ON cps.card_product_id = cp.id
+                LEFT JOIN stores s ON s.id = cps.store_id
+                WHERE cp.issuer_id = %s
+                GROUP BY cp.id
+            """, (self.ISSUER_ID,))
+            for name, store_count, age_seconds, store_names in cursor.fetchall():
+                self.product_snapshots[name] = {
+                    'store_count': store_count,
+                    'age_seconds': float(age_seconds) if age_seconds is not None else None,
+                    'store_names': sorted(store_names),
+                }
+            # End the read transaction so it isn't held open while scraping
+            self.conn.commit()
+            logger.info(f"Loaded last sync result for {len(self.product_snapshots)} products")
+        finally:
+            cursor.close()
+    
     def discover_buyme_products(self) -> Dict[str, str]:
         """
         Discover all gift card products starting with "Buyme" from BuyMe website.
@@ -360,10 +486,17 @@ class BuyMeDBSyncer:
         Scrape stores/businesses where a Buyme product can be redeemed.
         Returns normalized, deduplicated store names.
         Uses the page's store count to verify completeness.
+        In network mode the page's JSON feed is tried first; the DOM
+        scroll is only used when no feed is found.
         """
-        logger.info(f"Scraping stores from {product_url}")
+        self.last_expected_count = 0
+        if SCRAPE_MODE == 'network':
+            stores = self.scrape_stores_from_product_network(product_url)
+            if stores:
+                return stores
+            logger.info("  Falling back to DOM scraping")
         
-        raw_stores = set()
+        logger.info(f"Scraping stores from {product_url}")
         
         try:
             self.driver.get(product_url)
@@ -371,6 +504,7 @@ class BuyMeDBSyncer:
             
             # Get expected store count from the page
             expected_count = self._get_expected_store_count()
+            self.last_expected_count = expected_count
             logger.info(f"  Expected stores: {expected_count}")
             
             # Smart scrolling: scroll until we've loaded all stores
@@ -411,118 +545,450 @@ class BuyMeDBSyncer:
             self.driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
             time.sleep(1)
             
-            # TARGETED METHOD: Look for stores in the main content grid ONLY
-            # Exclude header, footer, sidebar, and navigation
+            raw_stores = self._read_store_names_from_dom(product_url)
             
-            # Get the current product's IDs to exclude it
-            current_supplier_id = product_url.split('/supplier/')[-1].split('?')[0] if '/supplier/' in product_url else ''
-            current_brand_id = product_url.split('/brands/')[-1].split('?')[0] if '/brands/' in product_url else ''
-            
-            # Find the main store grid container (BuyMe uses specific classes)
-            main_content_selectors = [
-                '.brands-page__results',      # Main results container
-                '.brands-page__grid',          # Grid container
-                '[class*="results"]',          # Generic results
-                '[class*="grid"]',             # Generic grid
-                'main',                        # Main content area
-            ]
+            clean_stores = self._dedupe_store_names(raw_stores)
+            self._log_store_completeness(len(clean_stores), expected_count)
+            return clean_stores
             
-            main_container = None
-            for selector in main_content_selectors:
+        except Exception as e:
+            logger.error(f"Error scraping product {product_url}: {e}")
+            return set()
+
+    def _read_store_names_from_dom(self, product_url: str) -> Set[str]:
+        """
+        Read raw store names (img alt) from the store grid as currently rendered.
+        Does not scroll; callers load as much of the grid as they need first.
+        """
+        raw_stores = set()
+        
+        # TARGETED METHOD: Look for stores in the main content grid ONLY
+        # Exclude header, footer, sidebar, and navigation
+        
+        # Get the current product's IDs to exclude it
+        current_supplier_id = product_url.split('/supplier/')[-1].split('?')[0] if '/supplier/' in product_url else ''
+        current_brand_id = product_url.split('/brands/')[-1].split('?')[0] if '/brands/' in product_url else ''
+        
+        # Find the main store grid container (BuyMe uses specific classes)
+        main_content_selectors = [
+            '.brands-page__results',      # Main results container
+            '.brands-page__grid',          # Grid container
+            '[class*="results"]',          # Generic results
+            '[class*="grid"]',             # Generic grid
+            'main',                        # Main content area
+        ]
+        
+        main_container = None
+        for selector in main_content_selectors:
+            try:
+                containers = self.driver.find_elements(By.CSS_SELECTOR, selector)
+                for container in containers:
+                    # Look for a container that has multiple supplier links
+                    links = container.find_elements(By.CSS_SELECTOR, 'a[href*="/supplier/"]')
+                    if len(links) > 5:  # Likely the store grid
+                        main_container = container
+                        break
+                if main_container:
+                    break
+            except Exception:
+                continue
+        
+        # If we found a main container, search within it; otherwise search the page but be very strict
+        search_context = main_container if main_container else self.driver
+        
+        # Look for supplier links (stores)
+        try:
+            supplier_links = search_context.find_elements(By.CSS_SELECTOR, 'a[href*="/supplier/"]')
+            logger.info(f"  Found {len(supplier_links)} supplier links to check")
+        
+            for link in supplier_links:
                 try:
-                    containers = self.driver.find_elements(By.CSS_SELECTOR, selector)
-                    for container in containers:
-                        # Look for a container that has multiple supplier links
-                        links = container.find_elements(By.CSS_SELECTOR, 'a[href*="/supplier/"]')
-                        if len(links) > 5:  # Likely the store grid
-                            main_container = container
+                    href = link.get_attribute('href') or ''
+        
+                    # Skip if this is the current product
+                    if current_supplier_id and current_supplier_id in href:
+                        continue
+        
+                    # Skip links in header/footer/nav by checking ancestors
+                    try:
+                        # Get the link's location on page - footer/header links are usually at top or bottom
+                        location = link.location
+                        if location and location.get('y', 0) < 200:  # Likely header
+                            continue
+                    except Exception:
+                        pass
+        
+                    # Get store name from image alt ONLY (most reliable, avoids text garbage)
+                    store_name = None
+                    imgs = link.find_elements(By.TAG_NAME, 'img')
+                    for img in imgs:
+                        alt = img.get_attribute('alt')
+                        if alt and alt.strip():
+                            store_name = alt.strip()
                             break
-                    if main_container:
-                        break
+        
+                    # Validate and add
+                    if store_name and self._is_valid_store_name(store_name):
+                        raw_stores.add(store_name)
+        
                 except Exception:
                     continue
+        except Exception:
+            pass
+        
+        return raw_stores
+
+    def _dedupe_store_names(self, raw_stores) -> Set[str]:
+        """Clean, validate and deduplicate raw store names by normalized form."""
+        seen_normalized = set()
+        clean_stores = set()
+        
+        for store in raw_stores:
+            clean = self.get_display_name(store)
+            normalized = self.normalize_store_name(clean)
+            
+            # Skip duplicates
+            if normalized in seen_normalized:
+                continue
             
-            # If we found a main container, search within it; otherwise search the page but be very strict
-            search_context = main_container if main_container else self.driver
+            # Double-check validity (in case something slipped through)
+            if not self._is_valid_store_name(clean):
+                continue
             
-            # Look for supplier links (stores)
+            seen_normalized.add(normalized)
+            clean_stores.add(clean)
+        
+        return clean_stores
+
+    def _log_store_completeness(self, actual_count: int, expected_count: int):
+        """Validate the scraped store count against the count the page reports."""
+        if expected_count > 0:
+            accuracy = (actual_count / expected_count) * 100
+            if accuracy >= 90:
+                logger.info(f"  ✓ Found {actual_count}/{expected_count} stores ({accuracy:.0f}%)")
+            elif accuracy >= 70:
+                logger.warning(f"  ⚠ Found {actual_count}/{expected_count} stores ({accuracy:.0f}%) - some may be missing")
+            else:
+                logger.warning(f"  ✗ Found only {actual_count}/{expected_count} stores ({accuracy:.0f}%) - check scraping logic")
+        else:
+            logger.info(f"  Found {actual_count} stores (expected count unknown)")
+
+    def _capture_json_responses(self) -> List[Tuple[str, Any]]:
+        """
+        Read JSON responses the page fetched from the DevTools performance log.
+        Each call drains the log. A response's body is read only once its
+        Network.loadingFinished event arrives; responses still downloading
+        are remembered and returned by a later call.
+        """
+        responses = []
+        for entry in self.driver.get_log('performance'):
             try:
-                supplier_links = search_context.find_elements(By.CSS_SELECTOR, 'a[href*="/supplier/"]')
-                logger.info(f"  Found {len(supplier_links)} supplier links to check")
+                message = json.loads(entry['message'])['message']
+                method = message.get('method')
+                params = message.get('params', {})
+                request_id = params.get('requestId')
                 
-                for link in supplier_links:
-                    try:
-                        href = link.get_attribute('href') or ''
-                        
-                        # Skip if this is the current product
-                        if current_supplier_id and current_supplier_id in href:
-                            continue
-                        
-                        # Skip links in header/footer/nav by checking ancestors
-                        try:
-                            # Get the link's location on page - footer/header links are usually at top or bottom
-                            location = link.location
-                            if location and location.get('y', 0) < 200:  # Likely header
-                                continue
-                        except Exception:
-                            pass
-                        
-                        # Get store name from image alt ONLY (most reliable, avoids text garbage)
-                        store_name = None
-                        imgs = link.find_elements(By.TAG_NAME, 'img')
-                        for img in imgs:
-                            alt = img.get_attribute('alt')
-                            if alt and alt.strip():
-                                store_name = alt.strip()
-                                break
-                        
-                        # Validate and add
-                        if store_name and self._is_valid_store_name(store_name):
-                            raw_stores.add(store_name)
-                            
-                    except Exception:
-                        continue
+                if method == 'Network.responseReceived':
+                    response = params['response']
+                    if 'json' in (response.get('mimeType') or '').lower():
+                        self._pending_feed_responses[request_id] = response['url']
+                elif method == 'Network.loadingFailed':
+                    self._pending_feed_responses.pop(request_id, None)
+                elif method == 'Network.loadingFinished' and request_id in self._pending_feed_responses:
+                    url = self._pending_feed_responses.pop(request_id)
+                    body = self.driver.execute_cdp_cmd('Network.getResponseBody', {'requestId': request_id})
+                    responses.append((url, json.loads(body.get('body') or 'null')))
             except Exception:
-                pass
-            
-            # Deduplicate using normalized names
-            seen_normalized = set()
-            clean_stores = set()
-            
-            for store in raw_stores:
-                clean = self.get_display_name(store)
-                normalized = self.normalize_store_name(clean)
-                
-                # Skip duplicates
-                if normalized in seen_normalized:
+                # Bodies of evicted/redirected responses are unavailable - skip them
+                continue
+        return responses
+
+    def _find_store_list(self, data: Any) -> List[Dict]:
+        """
+        Find the list of brand/supplier records in a JSON payload.
+        Picks the largest list of objects that carry a name-like key.
+        """
+        best: List[Dict] = []
+        stack = [data]
+        while stack:
+            node = stack.pop()
+            if isinstance(node, dict):
+                stack.extend(node.values())
+            elif isinstance(node, list):
+                records = [item for item in node if isinstance(item, dict)]
+                if records and len(records) > len(best) and any(
+                        self._store_name_from_record(record) for record in records):
+                    best = records
+                stack.extend(records)
+        return best
+
+    def _looks_like_store_feed(self, url: str, data: Any) -> bool:
+        """
+        Check that a JSON response is the brand list rather than a category,
+        menu or search-suggestion response: its URL must look like a brand
+        endpoint, or most of its names must pass the store-name filter.
+        """
+        records = self._find_store_list(data)
+        if not records:
+            return False
+        if any(hint in urlparse(url).path.lower() for hint in self.FEED_URL_HINTS):
+            return True
+        names = [self._store_name_from_record(record) for record in records]
+        valid = sum(1 for name in names if name and self._is_valid_store_name(name))
+        return valid >= 0.8 * len(records)
+
+    def _feed_matches_page_count(self, data: Any, page_count: int) -> bool:
+        """Cross-check a feed's size against the count the page shows."""
+        if page_count <= 0:
+            return True
+        feed_count = self._feed_total_count(data)
+        if not feed_count and self._next_feed_page_url('', data) is None:
+            # Single-page feed: its records are the whole list
+            feed_count = len(self._find_store_list(data))
+        if not feed_count:
+            return True
+        return self._count_within_tolerance(feed_count, page_count)
+
+    def _count_within_tolerance(self, count: int, page_count: int) -> bool:
+        """Check a store count is within FEED_COUNT_TOLERANCE of the page's count."""
+        return abs(count - page_count) <= self.FEED_COUNT_TOLERANCE * page_count
+
+    def _store_name_from_record(self, record: Dict) -> Optional[str]:
+        """Get the store name from a brand/supplier record, or a wrapper inside it."""
+        for key in self.FEED_NAME_KEYS:
+            value = record.get(key)
+            if isinstance(value, str) and value.strip():
+                return value.strip()
+        for wrapper in self.FEED_RECORD_WRAPPERS:
+            if isinstance(record.get(wrapper), dict):
+                name = self._store_name_from_record(record[wrapper])
+                if name:
+                    return name
+        return None
+
+    def _feed_total_count(self, data: Any) -> int:
+        """
+        Get the total record count a paginated feed reports (0 if unknown).
+        'count' is deliberately not used - many APIs put the page size there.
+        """
+        if isinstance(data, dict):
+            for key in ('total', 'totalCount', 'total_count', 'totalItems', 'totalResults',
+                        'total_results', 'totalElements'):
+                if isinstance(data.get(key), int):
+                    return data[key]
+            for key in ('meta', 'pagination', 'paging'):
+                if isinstance(data.get(key), dict):
+                    total = self._feed_total_count(data[key])
+                    if total:
+                        return total
+        return 0
+
+    def _next_feed_page_url(self, url: str, data: Any) -> Optional[str]:
+        """
+        Work out the URL of the next page of a paginated feed.
+        Supports an explicit next link, or page/totalPages counters with a
+        page query parameter. Returns None on the last (or only) page.
+        """
+        if not isinstance(data, dict):
+            return None
+        
+        containers = [data] + [data[key] for key in ('meta', 'pagination', 'paging', 'links')
+                               if isinstance(data.get(key), dict)]
+        
+        for container in containers:
+            for key in ('next', 'nextPage', 'next_page', 'next_page_url'):
+                value = container.get(key)
+                if isinstance(value, str) and value:
+                    return urljoin(url, value)
+        
+        for container in containers:
+            page = next((container[k] for k in ('page', 'currentPage', 'current_page')
+                         if isinstance(container.get(k), int)), None)
+            pages = next((container[k] for k in ('totalPages', 'total_pages', 'pages', 'last_page')
+                          if isinstance(container.get(k), int)), None)
+            if page is None or pages is None:
+                continue
+            if page >= pages:
+                return None
+            parsed = urlparse(url)
+            query = parse_qs(parsed.query)
+            page_param = next((k for k in ('page', 'pageNumber', 'p') if k in query), 'page')
+            query[page_param] = [str(page + 1)]
+            return urlunparse(parsed._replace(query=urlencode(query, doseq=True)))
+        
+        return None
+
+    def _fetch_json(self, url: str) -> Any:
+        """Fetch a JSON URL from inside the page, reusing its cookies and origin."""
+        result = self.driver.execute_async_script("""
+            const done = arguments[arguments.length - 1];
+            fetch(arguments[0], {credentials: 'include', headers: {'Accept': 'application/json'}})
+                .then(r => r.text()).then(done).catch(() => done(null));
+        """, url)
+        return json.loads(result) if result else None
+
+    def _store_names_from_feed_page(self, data: Any) -> Set[str]:
+        """Raw store names on one page of the JSON feed, passing the name filter."""
+        names = set()
+        for record in self._find_store_list(data):
+            name = self._store_name_from_record(record)
+            if name and self._is_valid_store_name(name):
+                names.add(name)
+        return names
+
+    def _load_page_with_capture(self, product_url: str):
+        """Load a page with a clean DevTools log, so captured responses belong to it."""
+        # Drain events left over from previous pages
+        self.driver.get_log('performance')
+        self._pending_feed_responses = {}
+        self.driver.get(product_url)
+
+    def _capture_store_feed(self, page_count: int) -> Tuple[Optional[str], Any]:
+        """
+        Wait for the page to fetch its brand-list feed and return the first page.
+        Responses that don't look like a store list, or whose size doesn't match
+        the page's count, are ignored.
+        
+        Returns:
+            (feed URL, first page data), or (None, None) if no feed was accepted
+        """
+        feed_url, feed_data = None, None
+        deadline = time.monotonic() + self.FEED_WAIT_SECONDS
+        while feed_url is None and time.monotonic() < deadline:
+            for url, data in self._capture_json_responses():
+                if not self._looks_like_store_feed(url, data):
                     continue
-                
-                # Double-check validity (in case something slipped through)
-                if not self._is_valid_store_name(clean):
+                if not self._feed_matches_page_count(data, page_count):
+                    logger.info(f"  Ignoring {url}: size doesn't match page count {page_count}")
                     continue
-                
-                seen_normalized.add(normalized)
-                clean_stores.add(clean)
-            
-            # Validate against expected count
-            actual_count = len(clean_stores)
-            if expected_count > 0:
-                accuracy = (actual_count / expected_count) * 100
-                if accuracy >= 90:
-                    logger.info(f"  ✓ Found {actual_count}/{expected_count} stores ({accuracy:.0f}%)")
-                elif accuracy >= 70:
-                    logger.warning(f"  ⚠ Found {actual_count}/{expected_count} stores ({accuracy:.0f}%) - some may be missing")
-                else:
-                    logger.warning(f"  ✗ Found only {actual_count}/{expected_count} stores ({accuracy:.0f}%) - check scraping logic")
-            else:
-                logger.info(f"  Found {actual_count} stores (expected count unknown)")
+                if feed_data is None or len(self._find_store_list(data)) > len(self._find_store_list(feed_data)):
+                    feed_url, feed_data = url, data
+            if feed_url is None:
+                time.sleep(0.5)
+        
+        if feed_url is None:
+            logger.info("  No JSON store feed captured")
+            return None, None
+        
+        if page_count <= 0 and not any(hint in urlparse(feed_url).path.lower()
+                                       for hint in self.FEED_URL_HINTS):
+            # Nothing to cross-check an unrecognised endpoint against
+            logger.info(f"  Page count unknown and {feed_url} isn't a known brand endpoint")
+            return None, None
+        
+        return feed_url, feed_data
+
+    def scrape_stores_from_product_network(self, product_url: str) -> Set[str]:
+        """
+        Scrape stores by intercepting the JSON feed the product page fetches
+        for its brand list, then paging through the feed directly.
+        No scrolling is needed. Returns an empty set (so the caller falls back
+        to the DOM scrape) if no feed is found or its size doesn't match the
+        store count shown on the page.
+        """
+        logger.info(f"Scraping stores from {product_url} (network capture)")
+        
+        try:
+            self._load_page_with_capture(product_url)
+            
+            # The page's own count is used to reject responses that aren't the store list
+            page_count = self._get_expected_store_count()
             
+            feed_url, feed_data = self._capture_store_feed(page_count)
+            if feed_url is None:
+                return set()
+            
+            logger.info(f"  Using feed: {feed_url}")
+            expected_count = self._feed_total_count(feed_data) or page_count
+            # Persist the page's own count, not the feed total - the probe reads the page
+            self.last_expected_count = page_count
+            
+            raw_stores = set()
+            url, data, pages = feed_url, feed_data, 0
+            while True:
+                pages += 1
+                raw_stores.update(self._store_names_from_feed_page(data))
+                url = self._next_feed_page_url(url, data)
+                if not url:
+                    break
+                if pages >= self.MAX_FEED_PAGES:
+                    logger.warning(f"  Feed has more than {self.MAX_FEED_PAGES} pages - discarding")
+                    return set()
+                data = self._fetch_json(url)
+                if data is None:
+                    # A partial read would delete real links in the link swap
+                    logger.warning(f"  Feed page {pages + 1} failed to load - discarding")
+                    return set()
+            
+            logger.info(f"  Read {pages} feed page(s)")
+            clean_stores = self._dedupe_store_names(raw_stores)
+            self._log_store_completeness(len(clean_stores), expected_count)
+            
+            # Too few stores would delete real links in the link swap; far more means a
+            # site-wide feed rather than this product's - either way let the DOM scrape decide
+            if page_count > 0 and not self._count_within_tolerance(len(clean_stores), page_count):
+                logger.warning(f"  Feed gave {len(clean_stores)} stores for a page listing {page_count} - discarding")
+                return set()
             return clean_stores
             
         except Exception as e:
-            logger.error(f"Error scraping product {product_url}: {e}")
+            logger.warning(f"Network capture failed for {product_url}: {e}")
             return set()
 
+    def needs_full_scrape(self, product_name: str, product_url: str) -> bool:
+        """
+        Verification mode probe: load the product page without scrolling,
+        read the store count and a first batch of store names (the feed's
+        first page in network mode, the first screenful of the grid otherwise),
+        and compare them to the last persisted result.
+        
+        Returns:
+            True if the product must be fully scraped
+        """
+        snapshot = self.product_snapshots.get(product_name)
+        if not snapshot or snapshot['store_count'] is None or snapshot['age_seconds'] is None:
+            logger.info("  No previous full scrape - full scrape needed")
+            return True
+        
+        age_days = snapshot['age_seconds'] / 86400
+        if age_days > FULL_SCRAPE_MAX_AGE_DAYS:
+            logger.info(f"  Last full scrape is {age_days:.1f} days old - full scrape needed")
+            return True
+        
+        try:
+            if SCRAPE_MODE == 'network':
+                self._load_page_with_capture(product_url)
+            else:
+                self.driver.get(product_url)
+            expected_count = self._get_expected_store_count()
+            if expected_count <= 0 or expected_count != snapshot['store_count']:
+                logger.info(f"  Store count {expected_count} != last {snapshot['store_count']} - full scrape needed")
+                return True
+            
+            # Sample from the source the full scrape uses, so name spellings match:
+            # the feed's first page in network mode, otherwise the rendered grid
+            raw_sample = None
+            if SCRAPE_MODE == 'network':
+                feed_url, feed_data = self._capture_store_feed(expected_count)
+                if feed_url is not None:
+                    raw_sample = self._store_names_from_feed_page(feed_data)
+            if raw_sample is None:
+                raw_sample = self._read_store_names_from_dom(product_url)
+            
+            known = {self.normalize_store_name(name) for name in snapshot['store_names']}
+            sample = self._dedupe_store_names(raw_sample)
+            unknown = [name for name in sample if self.normalize_store_name(name) not in known]
+            if not sample or unknown:
+                logger.info(f"  {len(unknown)}/{len(sample)} sampled stores not in last result - full scrape needed")
+                return True
+            
+            logger.info(f"  ✓ Unchanged: {expected_count} stores, {len(sample)} sampled stores match")
+            return False
+            
+        except Exception as e:
+            logger.warning(f"  Probe failed ({e}) - full scrape needed")
+            return True
+
     def ensure_issuer_exists(self):
         """Ensure the BuyMe issuer exists in the database."""
         cursor = self.conn.cursor()
@@ -579,10 +1045,132 @@ class BuyMeDBSyncer:
         """, (store_id, clean_name))
         
         self.store_cache[normalized] = store_id
+        self._pending_store_keys.append(normalized)
+        self._pending_store_ids.append(store_id)
         logger.info(f"  + Created new store: {clean_name}")
         
         return store_id
 
+    def _sync_product(self, cursor, product_name: str, product_info: Dict) -> Dict:
+        """
+        Apply one product's changes on the open transaction.
+        The caller commits, so row locks are held only for this product.
+        
+        Returns:
+            Link diff: card_product_id, product_created, stores_added,
+            stores_removed, stores_created
+        """
+        product_url = product_info['url']
+        stores = product_info['stores']
+        
+        # Verified by probe: links are unchanged, only mark the product verified
+        if not product_info.get('full_scrape', True):
+            cursor.execute("""
+                UPDATE card_products SET source_url = %s, last_verified_at = NOW()
+                WHERE issuer_id = %s AND name = %s
+                RETURNING id
+            """, (product_url, self.ISSUER_ID, product_name))
+            card_product_id = cursor.fetchone()[0]
+            logger.info(f"Verified CardProduct: {product_name} ({card_product_id})")
+            return {
+                'card_product_id': card_product_id,
+                'product_created': False,
+                'stores_added': [],
+                'stores_removed': [],
+                'stores_created': [],
+            }
+        
+        # 1. Upsert CardProduct (Buyme gift card)
+        card_product_id = str(uuid.uuid4())
+        cursor.execute("""
+            INSERT INTO card_products (id, issuer_id, name, source_url, last_verified_at,
+                                       last_scraped_at, scraped_store_count)
+            VALUES (%s, %s, %s, %s, NOW(), NOW(), %s)
+            ON CONFLICT (issuer_id, name) 
+            DO UPDATE SET source_url = EXCLUDED.source_url, last_verified_at = NOW(),
+                          last_scraped_at = NOW(), scraped_store_count = EXCLUDED.scraped_store_count
+            RETURNING id, (xmax = 0) AS inserted
+        """, (card_product_id, self.ISSUER_ID, product_name, product_url,
+              product_info.get('expected_count') or None))
+        
+        result = cursor.fetchone()
+        card_product_id = result[0] if result else card_product_id
+        product_created = bool(result[1]) if result else False
+        
+        logger.info(f"Synced CardProduct: {product_name} ({card_product_id})")
+        
+        # 2. Get or create stores
+        active_store_ids = list(dict.fromkeys(
+            self.get_or_create_store(cursor, store_name) for store_name in stores
+        ))
+        
+        # 3. Swap the link set: insert new links in one statement, then drop the rest.
+        #    RETURNING gives the exact diff without reading the old link set.
+        added: List[str] = []
+        if active_store_ids:
+            added = [row[0] for row in execute_values(cursor, """
+                INSERT INTO card_product_stores (card_product_id, store_id, type)
+                VALUES %s
+                ON CONFLICT (card_product_id, store_id) DO NOTHING
+                RETURNING store_id
+            """, [(card_product_id, store_id) for store_id in active_store_ids],
+                template="(%s, %s, 'both')", fetch=True)]
+            
+            cursor.execute("""
+                DELETE FROM card_product_stores 
+                WHERE card_product_id = %s AND store_id != ALL(%s)
+                RETURNING store_id
+            """, (card_product_id, active_store_ids))
+        else:
+            cursor.execute("""
+                DELETE FROM card_product_stores WHERE card_product_id = %s
+                RETURNING store_id
+            """, (card_product_id,))
+        removed = [row[0] for row in cursor.fetchall()]
+        if removed:
+            logger.info(f"  - Removed {len(removed)} outdated store links from {product_name}")
+        
+        return {
+            'card_product_id': card_product_id,
+            'product_created': product_created,
+            'stores_added': added,
+            'stores_removed': removed,
+            'stores_created': list(self._pending_store_ids),
+        }
+
+    def record_change_event(self, cursor, change: Dict) -> Optional[str]:
+        """
+        Write a product's link diff to the change outbox and NOTIFY listeners.
+        Runs on the product's transaction, so the event is visible (and the
+        notification delivered) only if the product's changes commit.
+        Unchanged products produce no event.
+        
+        Returns:
+            Event ID, or None if nothing changed
+        """
+        if not (change['product_created'] or change['stores_added'] or change['stores_removed']):
+            return None
+        
+        event_id = str(uuid.uuid4())
+        cursor.execute("""
+            INSERT INTO sync_change_events
+                (id, card_product_id, product_created, stores_added, stores_removed, stores_created)
+            VALUES (%s, %s, %s, %s, %s, %s)
+        """, (event_id, change['card_product_id'], change['product_created'],
+              change['stores_added'], change['stores_removed'], change['stores_created']))
+        
+        # Compact payload (NOTIFY is capped at 8000 bytes); full diff is in the outbox row
+        payload = json.dumps({
+            'event_id': event_id,
+            'card_product_id': change['card_product_id'],
+            'product_created': change['product_created'],
+            'added': len(change['stores_added']),
+            'removed': len(change['stores_removed']),
+        }, separators=(',', ':'))
+        cursor.execute("SELECT pg_notify(%s, %s)", (CHANGE_NOTIFY_CHANNEL, payload))
+        
+        return event_id
+
     def sync_to_database(self, scraped_data: Dict):
         """
         Sync scraped data to PostgreSQL database.
@@ -591,62 +1179,38 @@ class BuyMeDBSyncer:
         - Upserts Stores (businesses) with deduplication
         - Creates CardProductStore links
         - Removes outdated links
+        - Records each product's link diff in the change outbox
+        
+        Each product is committed in its own short transaction, so a sync
+        never holds locks on stores/card_product_stores for the whole run.
         """
         cursor = self.conn.cursor()
         
         try:
             for product_name, product_info in scraped_data['products'].items():
-                product_url = product_info['url']
-                stores = product_info['stores']
-                
-                # 1. Upsert CardProduct (Buyme gift card)
-                card_product_id = str(uuid.uuid4())
-                cursor.execute("""
-                    INSERT INTO card_products (id, issuer_id, name, source_url, last_verified_at)
-                    VALUES (%s, %s, %s, %s, NOW())
-                    ON CONFLICT (issuer_id, name) 
-                    DO UPDATE SET source_url = EXCLUDED.source_url, last_verified_at = NOW()
-                    RETURNING id
-                """, (card_product_id, self.ISSUER_ID, product_name, product_url))
-                
-                result = cursor.fetchone()
-                card_product_id = result[0] if result else card_product_id
-                
-                logger.info(f"Synced CardProduct: {product_name} ({card_product_id})")
-                
-                active_store_ids = []
-                
-                # 2. Get or create stores and link them
-                for store_name in stores:
-                    store_id = self.get_or_create_store(cursor, store_name)
-                    active_store_ids.append(store_id)
-                    
-                    # Link store to card product
-                    cursor.execute("""
-                        INSERT INTO card_product_stores (card_product_id, store_id, type)
-                        VALUES (%s, %s, 'both')
-                        ON CONFLICT (card_product_id, store_id) DO NOTHING
-                    """, (card_product_id, store_id))
-                
-                # 3. Remove old links (stores no longer listed)
-                if active_store_ids:
-                    cursor.execute("""
-                        DELETE FROM card_product_stores 
-                        WHERE card_product_id = %s AND store_id != ALL(%s)
-                    """, (card_product_id, active_store_ids))
-                    deleted = cursor.rowcount
-                    if deleted > 0:
-                        logger.info(f"  - Removed {deleted} outdated store links from {product_name}")
-                else:
-                    cursor.execute("""
-                        DELETE FROM card_product_stores WHERE card_product_id = %s
-                    """, (card_product_id,))
+                self._pending_store_keys = []
+                self._pending_store_ids = []
+                started = time.monotonic()
+                try:
+                    change = self._sync_product(cursor, product_name, product_info)
+                    event_id = self.record_change_event(cursor, change)
+                    self.conn.commit()
+                    if event_id:
+                        self.change_events.append(dict(change, event_id=event_id))
+                except Exception:
+                    self.conn.rollback()
+                    # Stores created in the rolled back transaction don't exist
+                    for key in self._pending_store_keys:
+                        self.store_cache.pop(key, None)
+                    raise
+                finally:
+                    self._pending_store_keys = []
+                    self._pending_store_ids = []
+                    self.product_tx_durations[product_name] = time.monotonic() - started
             
-            self.conn.commit()
             logger.info("Database sync complete!")
             
         except Exception as e:
-            self.conn.rollback()
             logger.error(f"Database error: {e}")
             raise
         finally:
@@ -659,12 +1223,21 @@ class BuyMeDBSyncer:
         logger.info("=" * 70)
         
         try:
-            self.setup_driver()
             self.connect_db()
             
+            # Only one sync at a time; skip quickly if another run holds the lock
+            if not self.acquire_run_lock():
+                logger.warning("Another sync is already running - skipping this run")
+                return
+            
+            self.setup_driver()
+            
             # Load existing stores into cache for deduplication
             self.load_existing_stores()
             
+            if VERIFY_MODE:
+                self.load_product_snapshots()
+            
             # Ensure issuer exists
             self.ensure_issuer_exists()
             
@@ -682,11 +1255,21 @@ class BuyMeDBSyncer:
             
             for product_name, product_url in buyme_products.items():
                 logger.info(f"Processing product: {product_name}")
-                stores = self.scrape_stores_from_product(product_url)
-                scraped_data['products'][product_name] = {
-                    'url': product_url,
-                    'stores': sorted(list(stores))
-                }
+                if VERIFY_MODE and not self.needs_full_scrape(product_name, product_url):
+                    snapshot = self.product_snapshots[product_name]
+                    scraped_data['products'][product_name] = {
+                        'url': product_url,
+                        'stores': snapshot['store_names'],
+                        'full_scrape': False,
+                    }
+                else:
+                    stores = self.scrape_stores_from_product(product_url)
+                    scraped_data['products'][product_name] = {
+                        'url': product_url,
+                        'stores': sorted(list(stores)),
+                        'full_scrape': True,
+                        'expected_count': self.last_expected_count,
+                    }
                 time.sleep(2)  # Politeness delay
             
             # Sync to database
@@ -698,13 +1281,25 @@ class BuyMeDBSyncer:
             
             logger.info("=" * 70)
             logger.info("SUMMARY:")
+            full_scrapes = sum(1 for prod in scraped_data['products'].values() if prod['full_scrape'])
             logger.info(f"  Total Buyme products: {len(scraped_data['products'])}")
+            logger.info(f"  Fully scraped: {full_scrapes}, verified unchanged: "
+                        f"{len(scraped_data['products']) - full_scrapes}")
             logger.info(f"  Unique stores in DB: {unique_stores}")
             logger.info(f"  Total store-product links: {total_store_links}")
+            logger.info(f"  Change events recorded: {len(self.change_events)}")
             logger.info("")
             logger.info("  Products breakdown:")
             for product_name, product_info in scraped_data['products'].items():
                 logger.info(f"    - {product_name}: {len(product_info['stores'])} stores")
+            if self.product_tx_durations:
+                durations = self.product_tx_durations.values()
+                logger.info("")
+                logger.info("  Lock hold times:")
+                logger.info(f"    Sync advisory lock: {time.monotonic() - self.run_lock_acquired_at:.1f}s")
+                logger.info(f"    Product transactions: max {max(durations):.2f}s, "
+                            f"avg {sum(durations) / len(durations):.2f}s, "
+                            f"total {sum(durations):.2f}s")
             logger.info("=" * 70)
             
         except Exception as e:
@@ -714,6 +1309,7 @@ class BuyMeDBSyncer:
             raise
         finally:
             self.close_driver()
+            self.release_run_lock()
             self.close_db()
     
     def get_known_buyme_products(self) -> Dict[str, str]:
@@ -0,0 +1,569 @@
+# buyme_sync_stress.py
+# Load-scale stress harness for the BuyMe sync's dedup and database paths
+# Generates synthetic catalogs and drives BuyMeDBSyncer against a scratch PostgreSQL
+#
+# Usage:
+#   STRESS_DATABASE_URL=postgresql://localhost/giftwallet_stress \
+#     python buyme_sync_stress.py --scale 10x100 --scale 100x1000 --timeout 1800
+#
+# Save a run with --json and pass it as --baseline later; the harness exits 1
+# if any metric got worse by more than --tolerance.
+#
+# Each scale point is PRODUCTSxSTORES_PER_PRODUCT. The database must already have
+# the schema (npx prisma db push); never point this at a database with real data.
+
+import os
+import sys
+import json
+import time
+import random
+import logging
+import argparse
+import resource
+import multiprocessing
+import queue
+import signal
+import traceback
+from typing import Dict, List, Set, Tuple
+import psycopg2
+from psycopg2.extensions import connection as _pg_connection, cursor as _pg_cursor
+
+from buyme_db_sync import BuyMeDBSyncer
+
+logger = logging.getLogger('buyme_sync_stress')
+
+# Kept separate from DATABASE_URL so the harness can't write to production by accident
+STRESS_DATABASE_URL = os.environ.get('STRESS_DATABASE_URL')
+
+STRESS_ISSUER_ID = 'stress-test'
+
+# Extra time a timed-out scale point gets to delete its rows before it is killed
+CLEANUP_GRACE_SECONDS = 300
+
+# Syllables used to build unique store names from an index
+ENGLISH_SYLLABLES = ['ka', 'lo', 'ri', 'ta', 'ne', 'vo', 'sa', 'mi', 'du', 'fe',
+                     'go', 'la', 'pi', 'ro', 'zu', 'ce', 'ha', 'ni', 'tu', 'xa']
+HEBREW_SYLLABLES = ['בר', 'גל', 'דן', 'הר', 'זה', 'חן', 'טל', 'כר', 'לב', 'מי',
+                    'נר', 'סף', 'עד', 'פז', 'צל', 'קו', 'רן', 'שי', 'תם', 'אל']
+ENGLISH_SUFFIXES = ['', ' Cafe', ' Store', ' Studio', ' Bistro', ' Spa', ' Shop', ' Bar']
+HEBREW_SUFFIXES = ['', ' קפה', ' סטודיו', ' ביסטרו', ' חנות', ' בר', ' ספא']
+
+# Names the scraper filter must reject (categories, UI text, phones, URLs, prices, products)
+NOISE_NAMES = [
+    'אופנה', 'מסעדות וקולינריה', 'חדש על המדף', 'הצג הכל', 'תנאי שימוש',
+    'מתנות ליום הולדת', 'רשתות אופנה', 'Privacy Policy', 'search', 'logo',
+    'Buyme Chef', 'BUYME Fashion', '03-1234567', '+972 52 1234567',
+    'www.example.co.il', 'https://buyme.co.il/', '₪ 100', '10:00 - 22:00',
+    '© 2024 BuyMe', 'info@example.com', 'x',
+]
+
+
+class ScalePointTimeout(Exception):
+    """Raised when a scale point runs past its time budget."""
+
+
+class CountingCursor(_pg_cursor):
+    """
+    Cursor that counts statements sent to the server and rows fetched into Python.
+    Rows matter as much as statements: a full-table SELECT is one round trip.
+    """
+
+    def execute(self, query, vars=None):
+        self.connection.round_trips += 1
+        return super().execute(query, vars)
+
+    def executemany(self, query, vars_list):
+        self.connection.round_trips += len(vars_list)
+        return super().executemany(query, vars_list)
+
+    def fetchone(self):
+        row = super().fetchone()
+        if row is not None:
+            self.connection.rows_fetched += 1
+        return row
+
+    def fetchmany(self, size=None):
+        rows = super().fetchmany(size) if size is not None else super().fetchmany()
+        self.connection.rows_fetched += len(rows)
+        return rows
+
+    def fetchall(self):
+        rows = super().fetchall()
+        self.connection.rows_fetched += len(rows)
+        return rows
+
+
+class CountingConnection(_pg_connection):
+    """Connection that counts round trips (statements, commits and rollbacks) and rows fetched."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.round_trips = 0
+        self.rows_fetched = 0
+
+    def cursor(self, *args, **kwargs):
+        kwargs.setdefault('cursor_factory', CountingCursor)
+        return super().cursor(*args, **kwargs)
+
+    def commit(self):
+        self.round_trips += 1
+        return super().commit()
+
+    def rollback(self):
+        self.round_trips += 1
+        return super().rollback()
+
+
+class CatalogGenerator:
+    """
+    Builds synthetic scrape results shaped like BuyMeDBSyncer's scraped_data.
+
+    - products x stores_per_product links
+    - overlap: fraction of each product's stores drawn from a pool shared by all products
+    - hebrew_ratio: fraction of store names written in Hebrew
+    - variant_ratio: fraction of listings using a case/whitespace/unicode variant of the name
+    - noise_ratio: extra invalid names per product, for the store-name filter
+    """
+
+    def __init__(self, syncer: BuyMeDBSyncer, overlap: float = 0.3, hebrew_ratio: float = 0.5,
+                 variant_ratio: float = 0.2, noise_ratio: float = 0.05, seed: int = 0):
+        self.syncer = syncer
+        self.overlap = overlap
+        self.hebrew_ratio = hebrew_ratio
+        self.variant_ratio = variant_ratio
+        self.noise_ratio = noise_ratio
+        self.rng = random.Random(seed)
+        self.next_index = 0
+
+    def _name_from_index(self, index: int, syllables: List[str], suffixes: List[str]) -> str:
+        """Encode an index as syllables (unique by construction) plus a suffix."""
+        parts = []
+        n = index
+        while True:
+            n, digit = divmod(n, len(syllables))
+            parts.append(syllables[digit])
+            if n == 0:
+                break
+        word = ''.join(parts)
+        return word.capitalize() + suffixes[index % len(suffixes)]
+
+    def new_store_name(self) -> str:
+        """Return a store name not generated before that passes the scraper filter."""
+        while True:
+            index = self.next_index
+            self.next_index += 1
+            if self.rng.random() < self.hebrew_ratio:
+                name = self._name_from_index(index, HEBREW_SYLLABLES, HEBREW_SUFFIXES)
+            else:
+                name = self._name_from_index(index, ENGLISH_SYLLABLES, ENGLISH_SUFFIXES)
+            if self.syncer._is_valid_store_name(name):
+                return name
+
+    def variant(self, name: str) -> str:
+        """A spelling of the name that normalizes to the same store."""
+        choice = self.rng.randrange(5)
+        if choice == 0:
+            return name.upper()
+        if choice == 1:
+            return name.lower()
+        if choice == 2:
+            return '  ' + name.replace(' ', '   ') + ' '
+        if choice == 3:
+            return name.replace(' ', '\u00a0')  # NBSP, folded by NFKC
+        # Fullwidth ASCII letters, folded by NFKC
+        return ''.join(chr(ord(c) + 0xFEE0) if 'A' <= c <= 'z' and c.isalpha() else c for c in name)
+
+    def raw_listing(self, stores: List[str]) -> List[str]:
+        """Store names as a scrape would see them: variants mixed in, plus noise."""
+        listing = [self.variant(s) if self.rng.random() < self.variant_ratio else s for s in stores]
+        noise_count = int(len(stores) * self.noise_ratio)
+        listing.extend(self.rng.choice(NOISE_NAMES) for _ in range(noise_count))
+        self.rng.shuffle(listing)
+        return listing
+
+    def generate(self, products: int, stores_per_product: int) -> Dict[str, List[str]]:
+        """
+        Returns:
+            Dictionary mapping product names to their (clean) store names
+        """
+        shared_pool = [self.new_store_name() for _ in range(stores_per_product)]
+        shared_count = int(stores_per_product * self.overlap)
+        catalog = {}
+        for i in range(products):
+            stores = self.rng.sample(shared_pool, shared_count)
+            stores.extend(self.new_store_name() for _ in range(stores_per_product - shared_count))
+            catalog[f"Stress Product {i + 1}"] = stores
+        return catalog
+
+    def churn(self, catalog: Dict[str, List[str]], ratio: float) -> Dict[str, List[str]]:
+        """Replace a fraction of each product's stores with new ones."""
+        churned = {}
+        for product_name, stores in catalog.items():
+            kept = self.rng.sample(stores, len(stores) - int(len(stores) * ratio))
+            kept.extend(self.new_store_name() for _ in range(len(stores) - len(kept)))
+            churned[product_name] = kept
+        return churned
+
+
+def peak_rss_mb() -> float:
+    """
+    Peak resident set size of this process so far (ru_maxrss is KB on Linux).
+    Each scale point runs in its own process, so this is that point's peak.
+    """
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def to_scraped_data(syncer: BuyMeDBSyncer, generator: CatalogGenerator,
+                    catalog: Dict[str, List[str]]) -> Tuple[Dict, int, float, float]:
+    """
+    Run raw listings through the scraper's normalization and dedup.
+
+    Returns:
+        (scraped_data, raw name count, normalize seconds, dedup seconds)
+    """
+    listings = {name: generator.raw_listing(stores) for name, stores in catalog.items()}
+    raw_count = sum(len(listing) for listing in listings.values())
+
+    started = time.perf_counter()
+    for listing in listings.values():
+        for name in listing:
+            syncer.normalize_store_name(name)
+    normalize_seconds = time.perf_counter() - started
+
+    scraped_data = {'products': {}}
+    started = time.perf_counter()
+    for product_name, listing in listings.items():
+        stores = syncer._dedupe_store_names(listing)
+        scraped_data['products'][product_name] = {
+            'url': f"https://stress.invalid/supplier/{product_name.replace(' ', '-').lower()}",
+            'stores': sorted(stores),
+            'full_scrape': True,
+            'expected_count': len(stores),
+        }
+    dedup_seconds = time.perf_counter() - started
+
+    return scraped_data, raw_count, normalize_seconds, dedup_seconds
+
+
+def timed_sync(syncer: BuyMeDBSyncer, scraped_data: Dict) -> Dict:
+    """Run sync_to_database and measure wall time, round trips and rows fetched."""
+    round_trips_before = syncer.conn.round_trips
+    rows_before = syncer.conn.rows_fetched
+    started = time.perf_counter()
+    syncer.sync_to_database(scraped_data)
+    seconds = time.perf_counter() - started
+    links = sum(len(p['stores']) for p in scraped_data['products'].values())
+    round_trips = syncer.conn.round_trips - round_trips_before
+    rows_fetched = syncer.conn.rows_fetched - rows_before
+    return {
+        'seconds': round(seconds, 3),
+        'links_per_second': round(links / seconds, 1) if seconds else None,
+        'round_trips': round_trips,
+        'round_trips_per_link': round(round_trips / links, 2) if links else None,
+        'rows_fetched': rows_fetched,
+        'rows_fetched_per_link': round(rows_fetched / links, 2) if links else None,
+    }
+
+
+def cleanup(conn, initial_store_ids: Set[str], syncer: BuyMeDBSyncer):
+    """Remove everything the scale point wrote: products, links, outbox rows and new stores."""
+    cursor = conn.cursor()
+    try:
+        cursor.execute("""
+            DELETE FROM sync_change_events WHERE card_product_id IN
+                (SELECT id FROM card_products WHERE issuer_id = %s)
+        """, (STRESS_ISSUER_ID,))
+        cursor.execute("DELETE FROM card_products WHERE issuer_id = %s", (STRESS_ISSUER_ID,))
+        created = [store_id for store_id in set(syncer.store_cache.values()) if store_id not in initial_store_ids]
+        if created:
+            cursor.execute("DELETE FROM stores WHERE id = ANY(%s)", (created,))
+        cursor.execute("DELETE FROM issuers WHERE id = %s", (STRESS_ISSUER_ID,))
+        conn.commit()
+    finally:
+        cursor.close()
+
+
+def run_scale_point(products: int, stores_per_product: int, args) -> Dict:
+    """
+    Generate a catalog of one size and drive dedup, cold sync and churn sync over it.
+    Stops at args.timeout seconds and returns the phases completed so far.
+    """
+    conn = psycopg2.connect(STRESS_DATABASE_URL, connection_factory=CountingConnection)
+    syncer = BuyMeDBSyncer()
+    syncer.conn = conn
+    syncer.ISSUER_ID = STRESS_ISSUER_ID
+    initial_store_ids: Set[str] = set()
+    result = {'products': products, 'stores_per_product': stores_per_product}
+    phase = 'setup'
+
+    def on_timeout(signum, frame):
+        raise ScalePointTimeout()
+
+    signal.signal(signal.SIGALRM, on_timeout)
+    signal.alarm(args.timeout)
+
+    try:
+        cursor = conn.cursor()
+        cursor.execute("""
+            INSERT INTO issuers (id, name) VALUES (%s, %s) ON CONFLICT (id) DO NOTHING
+        """, (STRESS_ISSUER_ID, 'Stress Test'))
+        cursor.execute("SELECT id FROM stores")
+        initial_store_ids = {row[0] for row in cursor.fetchall()}
+        conn.commit()
+        cursor.close()
+
+        phase = 'generate'
+        generator = CatalogGenerator(syncer, overlap=args.overlap, hebrew_ratio=args.hebrew_ratio,
+                                     variant_ratio=args.variant_ratio, noise_ratio=args.noise_ratio,
+                                     seed=args.seed)
+        catalog = generator.generate(products, stores_per_product)
+        result['unique_stores'] = len({syncer.normalize_store_name(s)
+                                       for stores in catalog.values() for s in stores})
+
+        phase = 'dedup'
+        scraped_data, raw_count, normalize_seconds, dedup_seconds = to_scraped_data(syncer, generator, catalog)
+        result['raw_names'] = raw_count
+        result['normalize_names_per_second'] = round(raw_count / normalize_seconds, 1) if normalize_seconds else None
+        result['dedup_names_per_second'] = round(raw_count / dedup_seconds, 1) if dedup_seconds else None
+
+        phase = 'load_existing_stores'
+        started = time.perf_counter()
+        syncer.load_existing_stores()
+        result['load_existing_stores_seconds'] = round(time.perf_counter() - started, 3)
+
+        phase = 'cold_sync'
+        result['cold_sync'] = timed_sync(syncer, scraped_data)
+
+        phase = 'churn_sync'
+        churned = generator.churn(catalog, args.churn)
+        churned_data = to_scraped_data(syncer, generator, churned)[0]
+        result['churn_sync'] = timed_sync(syncer, churned_data)
+
+    except ScalePointTimeout:
+        # Partial results still show where the time went
+        result['timed_out'] = phase
+        logger.warning(f"  Timed out after {args.timeout}s during {phase}")
+
+    finally:
+        signal.alarm(0)
+        result['store_cache_size'] = len(syncer.store_cache)
+        result['total_round_trips'] = conn.round_trips
+        result['total_rows_fetched'] = conn.rows_fetched
+        result['peak_rss_mb'] = round(peak_rss_mb(), 1)
+        if not args.keep:
+            conn.rollback()
+            cleanup(conn, initial_store_ids, syncer)
+        conn.close()
+
+    return result
+
+
+def count_stress_products() -> int:
+    """Number of synthetic products left in the database (e.g. by an earlier --keep run)."""
+    conn = psycopg2.connect(STRESS_DATABASE_URL)
+    try:
+        cursor = conn.cursor()
+        cursor.execute("SELECT COUNT(*) FROM card_products WHERE issuer_id = %s", (STRESS_ISSUER_ID,))
+        return cursor.fetchone()[0]
+    finally:
+        conn.close()
+
+
+def _scale_point_worker(products: int, stores_per_product: int, args, results):
+    """Subprocess entry point: run one scale point and send back its result."""
+    if not args.verbose:
+        logging.getLogger('buyme_db_sync').setLevel(logging.WARNING)
+    try:
+        results.put(('ok', run_scale_point(products, stores_per_product, args)))
+    except BaseException:
+        results.put(('error', traceback.format_exc()))
+
+
+def run_scale_point_isolated(products: int, stores_per_product: int, args) -> Dict:
+    """Run a scale point in a fresh process so peak RSS isn't carried over from earlier points."""
+    context = multiprocessing.get_context('spawn')
+    results = context.Queue()
+    worker = context.Process(target=_scale_point_worker,
+                             args=(products, stores_per_product, args, results))
+    worker.start()
+    # The child stops itself at args.timeout; allow time for its cleanup before killing it
+    deadline = time.monotonic() + args.timeout + CLEANUP_GRACE_SECONDS
+    try:
+        # Read before join: a large result can block the child while it flushes the queue
+        while True:
+            try:
+                status, payload = results.get(timeout=1)
+                break
+            except queue.Empty:
+                if time.monotonic() > deadline:
+                    worker.terminate()
+                    raise RuntimeError(f"Scale point {products}x{stores_per_product} didn't stop "
+                                       f"after its {args.timeout}s timeout - synthetic rows may be left behind")
+                if not worker.is_alive():
+                    raise RuntimeError(f"Scale point {products}x{stores_per_product} "
+                                       f"died with exit code {worker.exitcode}")
+    finally:
+        worker.join()
+    if status == 'error':
+        raise RuntimeError(f"Scale point {products}x{stores_per_product} failed:\n{payload}")
+    return payload
+
+
+# Metrics compared against a baseline run, and whether higher values are better
+BASELINE_METRICS = [
+    ('normalize_names_per_second', True),
+    ('dedup_names_per_second', True),
+    ('load_existing_stores_seconds', False),
+    ('cold_sync.links_per_second', True),
+    ('cold_sync.round_trips_per_link', False),
+    ('cold_sync.rows_fetched_per_link', False),
+    ('churn_sync.links_per_second', True),
+    ('churn_sync.round_trips_per_link', False),
+    ('churn_sync.rows_fetched_per_link', False),
+    ('peak_rss_mb', False),
+]
+
+
+def _metric(result: Dict, path: str):
+    """Look up a dotted metric path such as 'cold_sync.links_per_second' (None if missing)."""
+    value = result
+    for key in path.split('.'):
+        if not isinstance(value, dict) or key not in value:
+            return None
+        value = value[key]
+    return value
+
+
+def compare_to_baseline(results: List[Dict], baseline: List[Dict], tolerance: float) -> List[str]:
+    """
+    Compare results with a saved --json run, matching scale points by size.
+    A metric regresses when it is worse than the baseline by more than tolerance
+    (a fraction, e.g. 0.25 = 25%). A point that times out, or stops reporting a
+    metric the baseline had, also counts as a regression.
+    
+    Returns:
+        One message per regression (empty if none)
+    """
+    baseline_points = {(b['products'], b['stores_per_product']): b for b in baseline}
+    regressions = []
+    for result in results:
+        point = (result['products'], result['stores_per_product'])
+        label = f"{point[0]}x{point[1]}"
+        base = baseline_points.get(point)
+        if base is None:
+            continue
+        if 'timed_out' in result and 'timed_out' not in base:
+            regressions.append(f"{label}: timed out during {result['timed_out']} (baseline finished)")
+        for path, higher_is_better in BASELINE_METRICS:
+            old, new = _metric(base, path), _metric(result, path)
+            if old is None:
+                continue
+            if new is None:
+                regressions.append(f"{label} {path}: missing (baseline {old})")
+                continue
+            if higher_is_better:
+                regressed = new < old * (1 - tolerance)
+            else:
+                regressed = new > old * (1 + tolerance)
+            if regressed:
+                regressions.append(f"{label} {path}: {new} vs baseline {old}")
+    return regressions
+
+
+def parse_scale(value: str) -> Tuple[int, int]:
+    """Parse a PRODUCTSxSTORES_PER_PRODUCT scale point, e.g. '100x1000'."""
+    try:
+        products, stores = value.lower().split('x')
+        return int(products), int(stores)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"scale must look like 100x1000, got {value!r}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stress the BuyMe sync's dedup and DB paths at scale.")
+    parser.add_argument('--scale', type=parse_scale, action='append',
+                        help="PRODUCTSxSTORES_PER_PRODUCT (repeatable, default: "
+                             "10x100 20x500 50x1000 140x1000)")
+    parser.add_argument('--overlap', type=float, default=0.3, help="share of each product's stores common to all")
+    parser.add_argument('--hebrew-ratio', type=float, default=0.5, help="share of Hebrew store names")
+    parser.add_argument('--variant-ratio', type=float, default=0.2, help="share of listings using a name variant")
+    parser.add_argument('--noise-ratio', type=float, default=0.05, help="invalid names added per product listing")
+    parser.add_argument('--churn', type=float, default=0.05, help="share of stores replaced before the second sync")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--timeout', type=int, default=600, help="seconds allowed per scale point")
+    parser.add_argument('--json', help="also write results to this file")
+    parser.add_argument('--baseline', help="--json file from an earlier run; exit 1 if any metric regressed")
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help="allowed worsening against --baseline, as a fraction (default 0.25)")
+    parser.add_argument('--keep', action='store_true',
+                        help="keep the synthetic rows instead of deleting them (single --scale only)")
+    parser.add_argument('--verbose', action='store_true', help="keep the syncer's per-product/per-store logging")
+    args = parser.parse_args()
+
+    if not STRESS_DATABASE_URL:
+        logger.error("STRESS_DATABASE_URL is not set (use a scratch database, never production)")
+        sys.exit(1)
+
+    if not args.verbose:
+        logging.getLogger('buyme_db_sync').setLevel(logging.WARNING)
+
+    # 140x1000 is ~100k unique stores at the default overlap. It is expected to hit
+    # --timeout while get_or_create_store scans the stores table on cache misses;
+    # the partial result shows how far it got.
+    scales = args.scale or [(10, 100), (20, 500), (50, 1000), (140, 1000)]
+    if args.keep and len(scales) > 1:
+        # Later points would reuse the kept products and stores, so their "cold" sync wouldn't be cold
+        parser.error("--keep can only be used with a single --scale")
+
+    leftover = count_stress_products()
+    if leftover:
+        logger.error(f"{leftover} '{STRESS_ISSUER_ID}' products are already in the database "
+                     f"(left by --keep?) - remove them so the cold sync starts empty")
+        sys.exit(1)
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+    results = []
+
+    for products, stores_per_product in scales:
+        logger.info(f"Scale point {products}x{stores_per_product}...")
+        result = run_scale_point_isolated(products, stores_per_product, args)
+        results.append(result)
+        if 'raw_names' in result:
+            logger.info(f"  Unique stores: {result['unique_stores']}, raw names: {result['raw_names']}")
+            logger.info(f"  normalize: {result['normalize_names_per_second']:.0f} names/s, "
+                        f"dedup: {result['dedup_names_per_second']:.0f} names/s")
+        if 'load_existing_stores_seconds' in result:
+            logger.info(f"  load_existing_stores: {result['load_existing_stores_seconds']:.2f}s")
+        for phase in ('cold_sync', 'churn_sync'):
+            if phase not in result:
+                continue
+            stats = result[phase]
+            logger.info(f"  {phase}: {stats['seconds']:.2f}s, {stats['links_per_second']} links/s, "
+                        f"{stats['round_trips']} round trips ({stats['round_trips_per_link']}/link), "
+                        f"{stats['rows_fetched']} rows fetched ({stats['rows_fetched_per_link']}/link)")
+        if 'timed_out' in result:
+            logger.warning(f"  TIMED OUT during {result['timed_out']} "
+                           f"({result['total_round_trips']} round trips, {result['total_rows_fetched']} rows so far)")
+        logger.info(f"  Peak RSS: {result['peak_rss_mb']:.1f} MB")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2, ensure_ascii=False)
+        logger.info(f"Results written to {args.json}")
+
+    if baseline is not None:
+        regressions = compare_to_baseline(results, baseline, args.tolerance)
+        if regressions:
+            logger.error(f"{len(regressions)} regression(s) against {args.baseline}:")
+            for regression in regressions:
+                logger.error(f"  {regression}")
+            sys.exit(1)
+        logger.info(f"No regressions against {args.baseline} (tolerance {args.tolerance:.0%})")
+
+
+if __name__ == "__main__":
+    main()
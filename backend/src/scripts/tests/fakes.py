@@ -0,0 +1,106 @@
+# fakes.py
+# Stand-in for the Selenium Chrome driver used by BuyMeDBSyncer, for unit tests
+
+import json
+from typing import Dict, List, Optional
+
+
+def log_entry(method: str, **params) -> Dict:
+    """A Chrome performance-log entry as returned by driver.get_log('performance')."""
+    return {'message': json.dumps({'message': {'method': method, 'params': params}})}
+
+
+def response_received(request_id: str, url: str, mime_type: str = 'application/json') -> Dict:
+    return log_entry('Network.responseReceived', requestId=request_id,
+                     response={'url': url, 'mimeType': mime_type, 'status': 200})
+
+
+def loading_finished(request_id: str) -> Dict:
+    return log_entry('Network.loadingFinished', requestId=request_id)
+
+
+def loading_failed(request_id: str) -> Dict:
+    return log_entry('Network.loadingFailed', requestId=request_id, errorText='net::ERR_ABORTED')
+
+
+def json_response(request_id: str, url: str) -> List[Dict]:
+    """Log entries for a JSON response that finished downloading."""
+    return [response_received(request_id, url), loading_finished(request_id)]
+
+
+class FakeElement:
+
+    def __init__(self, text: str = '', attributes: Optional[Dict] = None, children: Optional[List] = None,
+                 y: int = 500):
+        self.text = text
+        self.attributes = attributes or {}
+        self.children = children or []
+        self.location = {'x': 0, 'y': y}
+
+    def get_attribute(self, name: str):
+        return self.attributes.get(name)
+
+    def find_elements(self, by, selector):
+        return list(self.children)
+
+
+def store_link(name: str, slug: str) -> FakeElement:
+    """A store tile in the brands grid: <a href=".../supplier/slug"><img alt="name"></a>."""
+    return FakeElement(attributes={'href': f'https://buyme.co.il/supplier/{slug}'},
+                       children=[FakeElement(attributes={'alt': name})])
+
+
+class FakeDriver:
+    """
+    Serves recorded data the way the Chrome driver would.
+
+    - performance_log: batches returned by successive get_log('performance') calls
+    - bodies: requestId -> response body text (an Exception is raised instead)
+    - page_count: value in the page's results counter (None if the page shows none)
+    - fetches: URL -> JSON text returned by in-page fetch (None for a failed fetch)
+    - store_links: store tiles currently rendered in the DOM
+    """
+
+    def __init__(self, performance_log: Optional[List[List[Dict]]] = None, bodies: Optional[Dict] = None,
+                 page_count: Optional[int] = None, fetches: Optional[Dict] = None,
+                 store_links: Optional[List[FakeElement]] = None):
+        self.performance_log = list(performance_log or [])
+        self.bodies = bodies or {}
+        self.page_count = page_count
+        self.fetches = fetches or {}
+        self.store_links = store_links or []
+        self.visited: List[str] = []
+        self.body_requests: List[str] = []
+        self.fetched: List[str] = []
+
+    def get(self, url: str):
+        self.visited.append(url)
+
+    def get_log(self, log_type: str) -> List[Dict]:
+        return self.performance_log.pop(0) if self.performance_log else []
+
+    def execute_cdp_cmd(self, command: str, params: Dict) -> Dict:
+        assert command == 'Network.getResponseBody'
+        self.body_requests.append(params['requestId'])
+        body = self.bodies[params['requestId']]
+        if isinstance(body, Exception):
+            raise body
+        return {'body': body, 'base64Encoded': False}
+
+    def execute_async_script(self, script: str, url: str):
+        self.fetched.append(url)
+        return self.fetches.get(url)
+
+    def execute_script(self, script: str, *args):
+        # Page height never grows, so scroll loops finish at once
+        return 1000
+
+    def find_element(self, by, selector):
+        if self.page_count is None:
+            raise Exception(f"no such element: {selector}")
+        return FakeElement(text=str(self.page_count))
+
+    def find_elements(self, by, selector):
+        if selector == 'a[href*="/supplier/"]':
+            return list(self.store_links)
+        return []
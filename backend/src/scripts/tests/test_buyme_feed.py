@@ -0,0 +1,245 @@
+# test_buyme_feed.py
+# Tests for network scrape mode: JSON feed parsing, DevTools capture and feed acceptance
+# Run with: python -m unittest discover -s backend/src/scripts/tests
+#
+# The fixtures are hand-written in the shapes common for paginated brand APIs
+# (page/totalPages counters, cursor next links, nested supplier records). They are
+# not recorded BuyMe responses - replace them with real captures once available.
+
+import os
+import sys
+import json
+import unittest
+from unittest import mock
+from urllib.parse import urlparse, parse_qs
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import buyme_db_sync
+from buyme_db_sync import BuyMeDBSyncer
+from fakes import (FakeDriver, store_link, json_response, response_received,
+                   loading_finished, loading_failed)
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+
+def load_fixture(name: str):
+    with open(os.path.join(FIXTURES_DIR, name), encoding='utf-8') as f:
+        return json.load(f)
+
+
+def fixture_text(name: str) -> str:
+    with open(os.path.join(FIXTURES_DIR, name), encoding='utf-8') as f:
+        return f.read()
+
+
+def cursor_feed(names, next_url=None) -> str:
+    """A cursor-paged brand feed with no total, as JSON text."""
+    return json.dumps({'results': [{'brandName': name} for name in names],
+                       'links': {'next': next_url}}, ensure_ascii=False)
+
+
+PRODUCT_URL = 'https://buyme.co.il/supplier/buyme-fashion'
+BRANDS_URL = 'https://buyme.co.il/api/brands?page=1&size=3'
+
+
+class FindStoreListTest(unittest.TestCase):
+
+    def setUp(self):
+        self.syncer = BuyMeDBSyncer()
+
+    def test_reads_names_nested_under_supplier(self):
+        records = self.syncer._find_store_list(load_fixture('brands_page_1.json'))
+        names = [self.syncer._store_name_from_record(r) for r in records]
+        self.assertEqual(names, ['קסטרו', 'Fox', 'רולדין'])
+
+    def test_reads_alternative_name_keys(self):
+        records = self.syncer._find_store_list(load_fixture('brands_cursor.json'))
+        names = [self.syncer._store_name_from_record(r) for r in records]
+        self.assertEqual(names, ['Renuar', 'American Eagle'])
+
+    def test_no_records_in_scalar_payload(self):
+        self.assertEqual(self.syncer._find_store_list({'ok': True, 'items': [1, 2, 3]}), [])
+
+
+class FeedTotalCountTest(unittest.TestCase):
+
+    def setUp(self):
+        self.syncer = BuyMeDBSyncer()
+
+    def test_reads_total_from_meta(self):
+        self.assertEqual(self.syncer._feed_total_count(load_fixture('brands_page_1.json')), 8)
+
+    def test_ignores_page_item_count(self):
+        self.assertEqual(self.syncer._feed_total_count(load_fixture('brands_cursor.json')), 0)
+
+
+class NextFeedPageUrlTest(unittest.TestCase):
+
+    def setUp(self):
+        self.syncer = BuyMeDBSyncer()
+
+    def test_advances_page_counter_and_keeps_query(self):
+        url = self.syncer._next_feed_page_url('https://buyme.co.il/api/brands?page=1&size=3',
+                                              load_fixture('brands_page_1.json'))
+        parsed = urlparse(url)
+        self.assertEqual(parsed.path, '/api/brands')
+        self.assertEqual(parse_qs(parsed.query), {'page': ['2'], 'size': ['3']})
+
+    def test_last_page_has_no_next(self):
+        self.assertIsNone(self.syncer._next_feed_page_url('https://buyme.co.il/api/brands?page=3',
+                                                          load_fixture('brands_page_3.json')))
+
+    def test_follows_relative_next_link(self):
+        url = self.syncer._next_feed_page_url('https://buyme.co.il/api/v2/brands',
+                                              load_fixture('brands_cursor.json'))
+        self.assertEqual(url, 'https://buyme.co.il/api/v2/brands?cursor=eyJvZmZzZXQiOjJ9')
+
+    def test_unpaginated_feed_has_no_next(self):
+        self.assertIsNone(self.syncer._next_feed_page_url('https://buyme.co.il/api/x',
+                                                          load_fixture('categories.json')))
+
+
+class FeedSelectionTest(unittest.TestCase):
+
+    def setUp(self):
+        self.syncer = BuyMeDBSyncer()
+
+    def test_rejects_category_list(self):
+        self.assertFalse(self.syncer._looks_like_store_feed('https://buyme.co.il/api/menu',
+                                                            load_fixture('categories.json')))
+
+    def test_accepts_brand_endpoint(self):
+        self.assertTrue(self.syncer._looks_like_store_feed('https://buyme.co.il/api/brands?page=1',
+                                                           load_fixture('brands_page_1.json')))
+
+    def test_accepts_valid_store_names_at_unknown_endpoint(self):
+        self.assertTrue(self.syncer._looks_like_store_feed('https://buyme.co.il/api/v2/list',
+                                                           load_fixture('brands_cursor.json')))
+
+    def test_size_checked_against_page_count(self):
+        data = load_fixture('brands_page_1.json')
+        self.assertTrue(self.syncer._feed_matches_page_count(data, 8))
+        self.assertFalse(self.syncer._feed_matches_page_count(data, 61))
+        # Single-page feed: its own records are the total
+        self.assertFalse(self.syncer._feed_matches_page_count(load_fixture('categories.json'), 61))
+        self.assertTrue(self.syncer._feed_matches_page_count(data, 0))
+
+
+class CaptureJsonResponsesTest(unittest.TestCase):
+
+    def setUp(self):
+        self.syncer = BuyMeDBSyncer()
+
+    def test_body_read_only_after_loading_finished(self):
+        self.syncer.driver = FakeDriver(
+            performance_log=[[response_received('1', BRANDS_URL)], [loading_finished('1')]],
+            bodies={'1': fixture_text('brands_page_1.json')})
+
+        self.assertEqual(self.syncer._capture_json_responses(), [])
+        self.assertEqual(self.syncer.driver.body_requests, [])
+
+        responses = self.syncer._capture_json_responses()
+        self.assertEqual([url for url, _ in responses], [BRANDS_URL])
+        self.assertEqual(responses[0][1], load_fixture('brands_page_1.json'))
+        self.assertEqual(self.syncer._pending_feed_responses, {})
+
+    def test_failed_loads_are_forgotten(self):
+        self.syncer.driver = FakeDriver(
+            performance_log=[[response_received('1', BRANDS_URL), loading_failed('1'), loading_finished('1')]])
+
+        self.assertEqual(self.syncer._capture_json_responses(), [])
+        self.assertEqual(self.syncer.driver.body_requests, [])
+
+    def test_non_json_responses_are_ignored(self):
+        self.syncer.driver = FakeDriver(
+            performance_log=[[response_received('1', 'https://buyme.co.il/app.js', 'text/javascript'),
+                              loading_finished('1')]])
+
+        self.assertEqual(self.syncer._capture_json_responses(), [])
+        self.assertEqual(self.syncer.driver.body_requests, [])
+
+    def test_unreadable_body_is_skipped(self):
+        self.syncer.driver = FakeDriver(
+            performance_log=[json_response('1', 'https://buyme.co.il/api/evicted')
+                             + json_response('2', BRANDS_URL)],
+            bodies={'1': Exception('No resource with given identifier found'),
+                    '2': fixture_text('brands_page_1.json')})
+
+        responses = self.syncer._capture_json_responses()
+        self.assertEqual([url for url, _ in responses], [BRANDS_URL])
+
+
+@mock.patch.object(buyme_db_sync.time, 'sleep', lambda seconds: None)
+class ScrapeStoresFromProductNetworkTest(unittest.TestCase):
+
+    def setUp(self):
+        self.syncer = BuyMeDBSyncer()
+        self.syncer.FEED_WAIT_SECONDS = 0.05
+
+    def paged_feed_driver(self, page_count, fetches=None):
+        return FakeDriver(
+            performance_log=[[], json_response('1', BRANDS_URL)],
+            bodies={'1': fixture_text('brands_page_1.json')},
+            page_count=page_count,
+            fetches=fetches if fetches is not None else {
+                'https://buyme.co.il/api/brands?page=2&size=3': fixture_text('brands_page_2.json'),
+                'https://buyme.co.il/api/brands?page=3&size=3': fixture_text('brands_page_3.json'),
+            })
+
+    def test_pages_through_accepted_feed(self):
+        self.syncer.driver = self.paged_feed_driver(page_count=8)
+
+        stores = self.syncer.scrape_stores_from_product_network(PRODUCT_URL)
+
+        self.assertEqual(stores, {'קסטרו', 'Fox', 'רולדין', 'Zara', 'מקס סטוק', 'H&M', 'Golf & Co', 'ארומה'})
+        self.assertEqual(len(self.syncer.driver.fetched), 2)
+        self.assertEqual(self.syncer.last_expected_count, 8)
+
+    def test_feed_total_far_from_page_count_is_rejected(self):
+        self.syncer.driver = self.paged_feed_driver(page_count=61)
+
+        self.assertEqual(self.syncer.scrape_stores_from_product_network(PRODUCT_URL), set())
+        self.assertEqual(self.syncer.driver.fetched, [])
+
+    def test_truncated_paging_is_discarded(self):
+        self.syncer.driver = self.paged_feed_driver(page_count=8, fetches={
+            'https://buyme.co.il/api/brands?page=2&size=3': fixture_text('brands_page_2.json'),
+        })
+
+        self.assertEqual(self.syncer.scrape_stores_from_product_network(PRODUCT_URL), set())
+
+    def test_oversized_cursor_feed_is_discarded(self):
+        first = [f'Brand {i}' for i in range(50)]
+        second = [f'Brand {i}' for i in range(50, 100)]
+        self.syncer.driver = FakeDriver(
+            performance_log=[[], json_response('1', 'https://buyme.co.il/api/v2/brands')],
+            bodies={'1': cursor_feed(first, '/api/v2/brands?cursor=2')},
+            page_count=10,
+            fetches={'https://buyme.co.il/api/v2/brands?cursor=2': cursor_feed(second)})
+
+        self.assertEqual(self.syncer.scrape_stores_from_product_network(PRODUCT_URL), set())
+
+    def test_category_response_is_not_taken_as_feed(self):
+        self.syncer.driver = FakeDriver(
+            performance_log=[[], json_response('1', 'https://buyme.co.il/api/menu')],
+            bodies={'1': fixture_text('categories.json')},
+            page_count=5)
+
+        self.assertEqual(self.syncer.scrape_stores_from_product_network(PRODUCT_URL), set())
+
+    def test_falls_back_to_dom_when_no_feed(self):
+        self.syncer.driver = FakeDriver(
+            performance_log=[[], json_response('1', 'https://buyme.co.il/api/menu')],
+            bodies={'1': fixture_text('categories.json')},
+            page_count=2,
+            store_links=[store_link('Castro', 'castro'), store_link('Fox', 'fox')])
+
+        with mock.patch.object(buyme_db_sync, 'SCRAPE_MODE', 'network'):
+            stores = self.syncer.scrape_stores_from_product(PRODUCT_URL)
+
+        self.assertEqual(stores, {'Castro', 'Fox'})
+
+
+if __name__ == '__main__':
+    unittest.main()
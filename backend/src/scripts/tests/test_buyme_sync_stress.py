@@ -0,0 +1,70 @@
+# test_buyme_sync_stress.py
+# Tests for the stress harness's baseline comparison
+# Run with: python -m unittest discover -s backend/src/scripts/tests
+
+import os
+import sys
+import copy
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from buyme_sync_stress import compare_to_baseline
+
+BASELINE_POINT = {
+    'products': 20,
+    'stores_per_product': 500,
+    'normalize_names_per_second': 200000.0,
+    'dedup_names_per_second': 50000.0,
+    'load_existing_stores_seconds': 0.2,
+    'cold_sync': {'links_per_second': 800.0, 'round_trips_per_link': 2.5, 'rows_fetched_per_link': 40.0},
+    'churn_sync': {'links_per_second': 3000.0, 'round_trips_per_link': 0.3, 'rows_fetched_per_link': 1.2},
+    'peak_rss_mb': 120.0,
+}
+
+
+class CompareToBaselineTest(unittest.TestCase):
+
+    def result(self, **changes):
+        point = copy.deepcopy(BASELINE_POINT)
+        for path, value in changes.items():
+            *parents, key = path.split('__')
+            target = point
+            for parent in parents:
+                target = target[parent]
+            target[key] = value
+        return point
+
+    def test_same_numbers_pass(self):
+        self.assertEqual(compare_to_baseline([self.result()], [BASELINE_POINT], 0.25), [])
+
+    def test_changes_within_tolerance_pass(self):
+        result = self.result(cold_sync__links_per_second=700.0, peak_rss_mb=140.0)
+        self.assertEqual(compare_to_baseline([result], [BASELINE_POINT], 0.25), [])
+
+    def test_slower_throughput_regresses(self):
+        result = self.result(cold_sync__links_per_second=400.0)
+        regressions = compare_to_baseline([result], [BASELINE_POINT], 0.25)
+        self.assertEqual(len(regressions), 1)
+        self.assertIn('cold_sync.links_per_second', regressions[0])
+
+    def test_more_rows_fetched_regresses(self):
+        result = self.result(cold_sync__rows_fetched_per_link=400.0)
+        regressions = compare_to_baseline([result], [BASELINE_POINT], 0.25)
+        self.assertIn('20x500 cold_sync.rows_fetched_per_link: 400.0 vs baseline 40.0', regressions)
+
+    def test_timeout_regresses(self):
+        result = self.result(timed_out='cold_sync')
+        del result['cold_sync']
+        del result['churn_sync']
+        regressions = compare_to_baseline([result], [BASELINE_POINT], 0.25)
+        self.assertTrue(any('timed out' in r for r in regressions))
+        self.assertTrue(any('cold_sync.links_per_second: missing' in r for r in regressions))
+
+    def test_points_missing_from_baseline_are_skipped(self):
+        result = self.result(products=100, stores_per_product=1000, peak_rss_mb=9999.0)
+        self.assertEqual(compare_to_baseline([result], [BASELINE_POINT], 0.25), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
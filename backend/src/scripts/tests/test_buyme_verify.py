@@ -0,0 +1,116 @@
+# test_buyme_verify.py
+# Tests for verification mode's probe (needs_full_scrape) with a stub driver
+# Run with: python -m unittest discover -s backend/src/scripts/tests
+
+import os
+import sys
+import json
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import buyme_db_sync
+from buyme_db_sync import BuyMeDBSyncer
+from fakes import FakeDriver, store_link, json_response
+
+PRODUCT = 'Buyme Fashion'
+PRODUCT_URL = 'https://buyme.co.il/supplier/buyme-fashion'
+DAY = 86400
+
+
+def snapshot(store_count=3, age_days=1.0, store_names=('Castro', 'Fox', 'Renuar')):
+    return {
+        'store_count': store_count,
+        'age_seconds': age_days * DAY if age_days is not None else None,
+        'store_names': sorted(store_names),
+    }
+
+
+@mock.patch.object(buyme_db_sync.time, 'sleep', lambda seconds: None)
+class NeedsFullScrapeDomTest(unittest.TestCase):
+
+    def setUp(self):
+        patcher = mock.patch.object(buyme_db_sync, 'SCRAPE_MODE', 'dom')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.syncer = BuyMeDBSyncer()
+        self.syncer.product_snapshots[PRODUCT] = snapshot()
+
+    def probe(self, page_count=3, names=('Castro', 'Fox')):
+        self.syncer.driver = FakeDriver(page_count=page_count,
+                                        store_links=[store_link(name, name.lower()) for name in names])
+        return self.syncer.needs_full_scrape(PRODUCT, PRODUCT_URL)
+
+    def test_no_snapshot(self):
+        del self.syncer.product_snapshots[PRODUCT]
+        self.assertTrue(self.probe())
+
+    def test_never_fully_scraped(self):
+        self.syncer.product_snapshots[PRODUCT] = snapshot(store_count=None, age_days=None)
+        self.assertTrue(self.probe())
+
+    def test_last_full_scrape_too_old(self):
+        self.syncer.product_snapshots[PRODUCT] = snapshot(age_days=buyme_db_sync.FULL_SCRAPE_MAX_AGE_DAYS + 1)
+        self.assertTrue(self.probe())
+        self.assertEqual(self.syncer.driver.visited, [])
+
+    def test_count_changed(self):
+        self.assertTrue(self.probe(page_count=4))
+
+    def test_count_unknown(self):
+        self.assertTrue(self.probe(page_count=None))
+
+    def test_count_zero(self):
+        self.assertTrue(self.probe(page_count=0))
+
+    def test_empty_sample(self):
+        self.assertTrue(self.probe(names=()))
+
+    def test_unknown_sampled_store(self):
+        self.assertTrue(self.probe(names=('Castro', 'Zara')))
+
+    def test_unchanged(self):
+        self.assertFalse(self.probe())
+
+    def test_sample_matches_despite_spelling_variants(self):
+        self.assertFalse(self.probe(names=('CASTRO', ' fox ')))
+
+
+@mock.patch.object(buyme_db_sync.time, 'sleep', lambda seconds: None)
+class NeedsFullScrapeNetworkTest(unittest.TestCase):
+
+    FEED_URL = 'https://buyme.co.il/api/brands'
+
+    def setUp(self):
+        patcher = mock.patch.object(buyme_db_sync, 'SCRAPE_MODE', 'network')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.syncer = BuyMeDBSyncer()
+        self.syncer.FEED_WAIT_SECONDS = 0.05
+        self.syncer.product_snapshots[PRODUCT] = snapshot(store_names=('קסטרו', 'Fox', 'Renuar'))
+
+    def probe(self, feed_names, dom_names=()):
+        body = json.dumps({'results': [{'brandName': name} for name in feed_names], 'total': 3},
+                          ensure_ascii=False)
+        self.syncer.driver = FakeDriver(
+            performance_log=[[], json_response('1', self.FEED_URL)],
+            bodies={'1': body},
+            page_count=3,
+            store_links=[store_link(name, name.lower()) for name in dom_names])
+        return self.syncer.needs_full_scrape(PRODUCT, PRODUCT_URL)
+
+    def test_samples_feed_not_dom(self):
+        # The DOM alt text spells the store differently; only the feed is compared
+        self.assertFalse(self.probe(feed_names=('קסטרו', 'Fox'), dom_names=('Castro Israel',)))
+
+    def test_unknown_store_in_feed(self):
+        self.assertTrue(self.probe(feed_names=('קסטרו', 'Zara')))
+
+    def test_falls_back_to_dom_without_feed(self):
+        self.syncer.driver = FakeDriver(page_count=3, store_links=[store_link('Fox', 'fox')])
+        self.assertFalse(self.syncer.needs_full_scrape(PRODUCT, PRODUCT_URL))
+
+
+if __name__ == '__main__':
+    unittest.main()